@@ -15,10 +15,16 @@ Features:
 """
 
 import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
 import io
 from datetime import datetime
-from collections import defaultdict, deque
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from itertools import zip_longest
 import sys
 import os
 
@@ -39,6 +45,24 @@ XER_REL_MAP = {
     'PR_SF': 'Start-to-Finish (SF)'
 }
 
+# XER tables read by the parser; sections for every other table are skipped
+XER_TABLES = {'TASK', 'TASKPRED', 'TASKRSRC', 'RSRC', 'ROLES', 'ROLERATE'}
+
+# TASKPRED fields kept by the parser (stored column-wise), with the value
+# used when the column is missing from the export
+XER_RELATIONSHIP_FIELDS = {
+    'pred_task_id': '',
+    'succ_task_id': '',
+    'pred_type': 'PR_FS',
+    'lag_hr_cnt': ''
+}
+
+# st.cache_data is process-wide (shared by every session), so bound it: parsed
+# files are large (roughly 1.5x the upload when pickled), summaries are small
+PARSE_CACHE_MAX_ENTRIES = 8
+ANALYSIS_CACHE_MAX_ENTRIES = 32
+CACHE_TTL = 60 * 60  # seconds
+
 # Helper functions (copied from original Schedulean.py)
 def safe_float(value, default=0.0):
     if value is None or value == '':
@@ -48,6 +72,15 @@ def safe_float(value, default=0.0):
     except (ValueError, TypeError):
         return default
 
+def safe_float_series(values, default=0.0):
+    """
+    Coerce a sequence to a float Series in one pass, like safe_float: blanks and
+    unparsable values become default. Unlike float(), pd.to_numeric rejects
+    underscore separators ('1_000') and maps 'nan' to default.
+    """
+    return (pd.to_numeric(pd.Series(values, dtype=object), errors='coerce')
+            .fillna(default).astype(float))
+
 def get_field_value(data_row, keys):
     """
     Extract a field value from a data row (dict) using a list of possible keys.
@@ -59,43 +92,143 @@ def get_field_value(data_row, keys):
             return val
     return None
 
+def to_csv_bytes(df):
+    """Serialize a DataFrame to CSV bytes using Arrow's native CSV writer."""
+    buffer = io.BytesIO()
+    pacsv.write_csv(pa.Table.from_pandas(df, preserve_index=False), buffer)
+    return buffer.getvalue()
+
 def analyze_redundant_logic(activities, relationships):
     """Detect redundant relationships in the project schedule."""
     try:
-        # Build adjacency list representation
-        graph = defaultdict(list)
-        rel_map = {}
+        # Relationship columns, with lags coerced to floats in one pass
+        lags = safe_float_series(relationships['lag_hr_cnt']).tolist()
+        edges = list(zip(relationships['pred_task_id'], relationships['succ_task_id'],
+                         relationships['pred_type'], lags))
         
-        for rel in relationships:
-            pred_id = rel.get('pred_task_id', '')
-            succ_id = rel.get('succ_task_id', '')
-            rel_type = rel.get('pred_type', 'PR_FS')
-            lag = safe_float(rel.get('lag_hr_cnt', 0))
-            
+        # Intern task ids to ints and build a CSR adjacency: the successors
+        # of node i are indices[indptr[i]:indptr[i + 1]]
+        node_index = {}
+        sources, targets = [], []
+        for pred_id, succ_id, _, _ in edges:
             if pred_id and succ_id:
-                graph[pred_id].append((succ_id, rel_type, lag))
-                rel_key = (pred_id, succ_id, rel_type)
-                rel_map[rel_key] = rel
+                sources.append(node_index.setdefault(pred_id, len(node_index)))
+                targets.append(node_index.setdefault(succ_id, len(node_index)))
+        
+        node_count = len(node_index)
+        sources = np.asarray(sources, dtype=np.int32)
+        targets = np.asarray(targets, dtype=np.int32)
+        indices = targets[np.argsort(sources, kind='stable')]
+        indptr = np.zeros(node_count + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=node_count), out=indptr[1:])
+        # Plain lists index faster than NumPy scalars in the Python loops below
+        indices, indptr = indices.tolist(), indptr.tolist()
         
+        # Activity codes for readable output
+        task_code_by_id = {}
+        for act in activities:
+            task_code_by_id.setdefault(act.get('task_id', ''),
+                                       act.get('task_code', act.get('task_id', '')))
+
+        # Compute the descendants of every node once as int bitsets, so each
+        # relationship check below is a bit test. Plain post-order bitsets are
+        # incomplete inside a logic loop (a node whose loop partner is still on
+        # the DFS stack misses that partner's descendants, so results would
+        # depend on DFS order). Tarjan's SCC bookkeeping is folded into the same
+        # iterative DFS instead: every member of a loop gets the loop's full
+        # closure, and successor loops are always finished first.
+        descendants = [0] * node_count
+        discovered = [-1] * node_count
+        lowlink = [0] * node_count
+        on_stack = [False] * node_count
+        loop_of = list(range(node_count))  # root of each node's component
+        in_loop = [False] * node_count
+        component = []
+        counter = 0
+        for root in range(node_count):
+            if discovered[root] != -1:
+                continue
+            discovered[root] = lowlink[root] = counter
+            counter += 1
+            component.append(root)
+            on_stack[root] = True
+            stack = [(root, indptr[root])]
+            while stack:
+                node, pos = stack[-1]
+                if pos < indptr[node + 1]:
+                    child = indices[pos]
+                    stack[-1] = (node, pos + 1)
+                    if discovered[child] == -1:
+                        discovered[child] = lowlink[child] = counter
+                        counter += 1
+                        component.append(child)
+                        on_stack[child] = True
+                        stack.append((child, indptr[child]))
+                    elif on_stack[child]:
+                        lowlink[node] = min(lowlink[node], discovered[child])
+                    continue
+                stack.pop()
+                if stack:
+                    parent = stack[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[node])
+                if lowlink[node] != discovered[node]:
+                    continue
+                # node roots a strongly connected component: pop its members
+                members = []
+                while True:
+                    member = component.pop()
+                    on_stack[member] = False
+                    members.append(member)
+                    if member == node:
+                        break
+                mask = 0
+                for member in members:
+                    for child in indices[indptr[member]:indptr[member + 1]]:
+                        mask |= descendants[child] | (1 << child)
+                for member in members:
+                    descendants[member] = mask
+                if len(members) > 1 or mask >> node & 1:
+                    for member in members:
+                        loop_of[member] = node
+                        in_loop[member] = True
+
+        def has_path_avoiding(u, v):
+            """Search u's other successors for v without passing back through u."""
+            seen = {u}
+            pending = [w for w in indices[indptr[u]:indptr[u + 1]] if w != v]
+            while pending:
+                node = pending.pop()
+                if node == v:
+                    return True
+                if node in seen or not descendants[node] >> v & 1:
+                    continue
+                if loop_of[node] != loop_of[u]:
+                    return True  # outside u's loop, so no path back through u
+                seen.add(node)
+                pending.extend(indices[indptr[node]:indptr[node + 1]])
+            return False
+
         redundant_relationships = []
         total_checked = 0
-        
+
         # Check each relationship for redundancy
-        for rel in relationships:
+        for pred_id, succ_id, rel_type, direct_lag in edges:
             total_checked += 1
-            pred_id = rel.get('pred_task_id', '')
-            succ_id = rel.get('succ_task_id', '')
-            rel_type = rel.get('pred_type', 'PR_FS')
-            direct_lag = safe_float(rel.get('lag_hr_cnt', 0))
-            
+
             if pred_id and succ_id:
-                # Check for alternate paths
-                if has_alternate_path(graph, pred_id, succ_id, (rel_type, direct_lag)):
+                # Redundant if the successor is reachable through another successor.
+                # Outside a loop no path can return to u, so the closure answers
+                # this directly; inside one, search for a path that avoids u.
+                u, v = node_index[pred_id], node_index[succ_id]
+                if in_loop[u]:
+                    redundant = has_path_avoiding(u, v)
+                else:
+                    redundant = any(descendants[w] >> v & 1
+                                    for w in indices[indptr[u]:indptr[u + 1]] if w != v)
+                if redundant:
                     # Get activity codes for readable output
-                    pred_code = next((act.get('task_code', pred_id) for act in activities 
-                                    if act.get('task_id', '') == pred_id), pred_id)
-                    succ_code = next((act.get('task_code', succ_id) for act in activities 
-                                    if act.get('task_id', '') == succ_id), succ_id)
+                    pred_code = task_code_by_id.get(pred_id, pred_id)
+                    succ_code = task_code_by_id.get(succ_id, succ_id)
                     
                     redundant_relationships.append({
                         'predecessor_id': pred_id,
@@ -120,44 +253,14 @@ def analyze_redundant_logic(activities, relationships):
             'redundant_count': 0
         }
 
-def has_alternate_path(graph, start, end, direct_rel):
-    """Check if there's an alternate path between start and end nodes."""
-    direct_type, direct_lag = direct_rel
-    
-    # Use BFS to find alternate paths
-    queue = deque([(start, 0, [])])  # (current_node, cumulative_lag, path)
-    visited = set()
-    max_depth = 10  # Prevent infinite loops
-    
-    while queue and len(visited) < 1000:  # Limit iterations
-        current, cumulative_lag, path = queue.popleft()
-        
-        if len(path) > max_depth:
-            continue
-            
-        if current == end and len(path) > 1:  # Found alternate path
-            return True
-            
-        if current in visited:
-            continue
-            
-        visited.add(current)
-        
-        # Explore neighbors
-        for neighbor, rel_type, lag in graph.get(current, []):
-            if neighbor not in path:  # Avoid cycles
-                new_path = path + [current]
-                queue.append((neighbor, cumulative_lag + lag, new_path))
-    
-    return False
-
 def parse_file_content(content, filename):
-    """Parse XER or XML file content and return structured data."""
+    """Parse raw XER or XML file bytes and return structured data."""
     try:
         if filename.lower().endswith('.xer'):
-            return parse_xer_simplified(content)
+            return parse_xer_simplified(iter_xer_lines(content))
         elif filename.lower().endswith('.xml'):
-            return parse_xml_simplified(content)
+            stream = io.TextIOWrapper(io.BytesIO(content), encoding='utf-8', errors='ignore')
+            return parse_xml_simplified(stream)
         else:
             st.error(f"Unsupported file type: {filename}")
             return None
@@ -165,29 +268,77 @@ def parse_file_content(content, filename):
         st.error(f"Error parsing {filename}: {e}")
         return None
 
-def parse_xer_simplified(content):
-    """Complete XER parser adapted from original Schedulean.py."""
-    lines = content.splitlines()
-    tasks, preds, assigns, resources, roles, role_rates = [], [], [], [], [], []
-    current, cols = None, []
+def iter_xer_lines(content, tables=XER_TABLES):
+    """
+    Yield the decoded lines of the XER sections whose table is in tables.
+    %T markers are located with bytes.find over the raw buffer, so sections
+    for other tables are never decoded or split into lines.
+    """
+    marker = b'\n%T\t'
+    start = 0 if content.startswith(marker[1:]) else content.find(marker)
+    while start != -1:
+        if content.startswith(b'\n', start): start += 1  # newline before %T
+        end = content.find(marker, start)
+        section_end = end + 1 if end != -1 else len(content)
+        header_end = content.find(b'\n', start, section_end)
+        header = content[start:header_end if header_end != -1 else section_end]
+        name = header.split(b'\t')[1].strip().decode('utf-8', errors='ignore')
+        if name in tables:
+            yield from content[start:section_end].decode('utf-8', errors='ignore').split('\n')
+        start = end
+
+def parse_xer_simplified(lines):
+    """
+    Complete XER parser adapted from original Schedulean.py.
+    Consumes any iterable of lines (e.g. a text stream), so the whole file
+    is never held in memory as one decoded string.
+    """
+    tasks, assigns, resources, roles, role_rates = [], [], [], [], []
+    # Relationships are stored column-wise, keeping only the fields the
+    # analysis reads rather than a full dict per TASKPRED row
+    preds = {field: [] for field in XER_RELATIONSHIP_FIELDS}
+
+    def append_relationship(row):
+        for field, default in XER_RELATIONSHIP_FIELDS.items():
+            preds[field].append(row.get(field, default))
+
+    # Bound appenders per table; sections for any other table are skipped
+    appenders = {
+        'TASK': tasks.append,
+        'TASKPRED': append_relationship,
+        'TASKRSRC': assigns.append,
+        'RSRC': resources.append,
+        'ROLES': roles.append,
+        'ROLERATE': role_rates.append
+    }
+    # Low-cardinality type codes are interned so repeated values share one
+    # string object instead of a fresh copy per row
+    code_fields = {'TASK': 'task_type', 'TASKPRED': 'pred_type', 'RSRC': 'rsrc_type'}
+    table, append, cols, ncols, code_field = None, None, [], 0, None
 
     for raw in lines:
         line = raw.strip()
         if not line: continue
         if line.startswith('%T'):
-            current = line.split('\t')[1]
-            cols = []
+            table = line.split('\t')[1]
+            append = appenders.get(table)
+            cols, ncols, code_field = [], 0, None
+        elif append is None:
+            continue
+        elif line.startswith('%R'):
+            if not ncols: continue
+            # Short rows are padded with '', extra trailing fields are dropped
+            values = line.split('\t', ncols + 1)
+            row = dict(zip_longest(cols, values[1:ncols + 1], fillvalue=''))
+            if code_field:
+                row[code_field] = sys.intern(row[code_field])
+            append(row)
         elif line.startswith('%F'):
             cols = line.split('\t')[1:]
-        elif line.startswith('%R') and current and cols:
-            values = line.split('\t')[1:]
-            row = {cols[i]: values[i] if i < len(values) else '' for i in range(len(cols))}
-            if current == 'TASK': tasks.append(row)
-            elif current == 'TASKPRED': preds.append(row)
-            elif current == 'TASKRSRC': assigns.append(row)
-            elif current == 'RSRC': resources.append(row)
-            elif current == 'ROLES': roles.append(row)
-            elif current == 'ROLERATE': role_rates.append(row)
+            ncols = len(cols)
+            code_field = code_fields.get(table)
+            if code_field not in cols:
+                code_field = None
     
     return {
         'activities': tasks,
@@ -199,85 +350,85 @@ def parse_xer_simplified(content):
         'filename': 'XER File'
     }
 
-def parse_xml_simplified(content):
+def parse_xml_simplified(stream):
     """Simplified XML parser - would need full implementation."""
     # This is a placeholder - you'd need to implement the full XML parsing
     st.warning("XML parsing not fully implemented in this demo version")
     return {
         'activities': [],
-        'relationships': [],
+        'relationships': {field: [] for field in XER_RELATIONSHIP_FIELDS},
         'assignments': [],
         'resources': [],
         'filename': 'XML File'
     }
 
-def analyze_project_data(data):
-    """Analyze parsed project data and return metrics."""
+def analyze_summary(data):
+    """Analyze parsed project data and return count and cost metrics."""
     activities = data['activities']
     relationships = data['relationships']
     assignments = data['assignments']
     resources = data['resources']
     
+    # Resource lookups, built once: rsrc_id -> rsrc_type -> cost category
+    rsrc_type_by_id = {r.get('rsrc_id', ''): r.get('rsrc_type', '') for r in resources}
+    rsrc_categories = {'RT_Labor': 'Labor', 'RT_Mat': 'Material'}
+    category_by_id = {rsrc_id: rsrc_categories.get(rsrc_type, 'Non-Labor')
+                      for rsrc_id, rsrc_type in rsrc_type_by_id.items()}
+    
     # Activity type analysis using proper mapping
-    activity_counts = {v: 0 for v in XER_ACTIVITY_MAP.values()}
-    for activity in activities:
-        task_type = activity.get('task_type', '')
-        name = XER_ACTIVITY_MAP.get(task_type)
-        if name:
-            activity_counts[name] += 1
+    activity_types = Counter(a.get('task_type', '') for a in activities)
+    activity_counts = {name: activity_types[code] for code, name in XER_ACTIVITY_MAP.items()}
     
     # Relationship type analysis using proper mapping
-    relationship_counts = {v: 0 for v in XER_REL_MAP.values()}
-    for rel in relationships:
-        rel_type = rel.get('pred_type', 'PR_FS')
-        name = XER_REL_MAP.get(rel_type)
-        if name:
-            relationship_counts[name] += 1
+    relationship_types = Counter(relationships['pred_type'])
+    relationship_counts = {name: relationship_types[code] for code, name in XER_REL_MAP.items()}
     
-    # Resource assignment analysis
-    resource_counts = defaultdict(int)
+    # Resource assignment and cost analysis in a single vectorized pass
     total_assignments = len(assignments)
-    
-    # Create resource lookup
-    resource_lookup = {r.get('rsrc_id', ''): r for r in resources}
-    
-    for assignment in assignments:
-        rsrc_id = assignment.get('rsrc_id', '')
-        resource = resource_lookup.get(rsrc_id, {})
-        rsrc_type = resource.get('rsrc_type', '')
-        
-        if rsrc_type == 'RT_Labor':
-            resource_counts['Labor'] += 1
-        elif rsrc_type == 'RT_Mat':
-            resource_counts['Material'] += 1
-        else:
-            resource_counts['Non-Labor'] += 1
-    
+    assignment_df = pd.DataFrame(assignments, columns=['rsrc_id', 'target_cost'])
+    assignment_df['category'] = assignment_df['rsrc_id'].map(category_by_id).fillna('Non-Labor')
+    assignment_df['cost'] = safe_float_series(assignment_df['target_cost'])
+
+    resource_counts = assignment_df['category'].value_counts(sort=False)
+
     # Cost analysis
-    labor_cost = sum(safe_float(a.get('target_cost', 0)) for a in assignments 
-                    if resource_lookup.get(a.get('rsrc_id', ''), {}).get('rsrc_type') == 'RT_Labor')
-    nonlabor_cost = sum(safe_float(a.get('target_cost', 0)) for a in assignments 
-                       if resource_lookup.get(a.get('rsrc_id', ''), {}).get('rsrc_type') not in ['RT_Labor', 'RT_Mat'])
-    material_cost = sum(safe_float(a.get('target_cost', 0)) for a in assignments 
-                       if resource_lookup.get(a.get('rsrc_id', ''), {}).get('rsrc_type') == 'RT_Mat')
-    
-    # Redundant logic analysis
-    redundant_logic = analyze_redundant_logic(activities, relationships)
+    cost_by_category = assignment_df.groupby('category')['cost'].sum()
+    labor_cost = float(cost_by_category.get('Labor', 0.0))
+    nonlabor_cost = float(cost_by_category.get('Non-Labor', 0.0))
+    material_cost = float(cost_by_category.get('Material', 0.0))
     
     return {
         'activity_counts': dict(activity_counts),
         'relationship_counts': dict(relationship_counts),
-        'resource_counts': dict(resource_counts),
+        'resource_counts': {k: int(v) for k, v in resource_counts.items()},
         'total_assignments': total_assignments,
         'total_resources': len(resources),
         'costs': {
             'labor': labor_cost,
             'nonlabor': nonlabor_cost,
             'material': material_cost
-        },
-        'redundant_logic': redundant_logic
+        }
     }
 
+@st.cache_data(show_spinner=False, max_entries=PARSE_CACHE_MAX_ENTRIES, ttl=CACHE_TTL)
+def _parse_cached(filename, content):
+    """Parse raw file bytes, cached on their content across reruns."""
+    return parse_file_content(content, filename)
+
+@st.cache_data(show_spinner=False, max_entries=ANALYSIS_CACHE_MAX_ENTRIES, ttl=CACHE_TTL)
+def _analyze_cached(filename, content):
+    """Summarize raw file bytes, cached on their content across reruns."""
+    data = _parse_cached(filename, content)
+    if not data:
+        return None
+    return analyze_summary(data)
+
+@st.cache_data(show_spinner=False, max_entries=ANALYSIS_CACHE_MAX_ENTRIES, ttl=CACHE_TTL)
+def _redundant_logic_cached(filename, content):
+    """Run redundant logic detection on raw file bytes, cached across reruns."""
+    data = _parse_cached(filename, content)
+    return analyze_redundant_logic(data['activities'], data['relationships'])
+
 # Streamlit App
 def main():
     st.set_page_config(
@@ -297,6 +448,10 @@ def main():
         accept_multiple_files=True,
         help="Upload one or more Primavera P6 XER or XML export files"
     )
+    check_redundant = st.sidebar.checkbox(
+        "🔍 Detect redundant logic",
+        help="Graph analysis of all relationships; can be slow on large schedules"
+    )
     
     if not uploaded_files:
         st.info("👆 Please upload one or more P6 files using the sidebar to begin analysis")
@@ -322,24 +477,30 @@ def main():
     
     # Process uploaded files
     all_results = []
+    all_files = []  # (filename, raw bytes) aligned with all_results
+    
+    payloads = [(uploaded_file.name, uploaded_file.getvalue()) for uploaded_file in uploaded_files]
     
     with st.spinner("🔄 Processing files..."):
-        for uploaded_file in uploaded_files:
+        # Files are independent, so parse and analyze them concurrently;
+        # workers share the script context so cached calls and errors render
+        ctx = get_script_run_ctx()
+        with ThreadPoolExecutor(max_workers=min(8, len(payloads)),
+                                initializer=add_script_run_ctx, initargs=(None, ctx)) as executor:
+            futures = [executor.submit(_analyze_cached, *payload) for payload in payloads]
+        
+        for (filename, content), future in zip(payloads, futures):
             try:
-                # Read file content
-                content = uploaded_file.read().decode('utf-8', errors='ignore')
-                
-                # Parse the file
-                data = parse_file_content(content, uploaded_file.name)
+                # Parse and analyze, reusing cached results on reruns
+                results = future.result()
                 
-                if data:
-                    # Analyze the data
-                    results = analyze_project_data(data)
-                    results['filename'] = uploaded_file.name
+                if results:
+                    results['filename'] = filename
                     all_results.append(results)
+                    all_files.append((filename, content))
                     
             except Exception as e:
-                st.error(f"Error processing {uploaded_file.name}: {e}")
+                st.error(f"Error processing {filename}: {e}")
     
     if not all_results:
         st.error("No files were successfully processed. Please check your file formats.")
@@ -360,6 +521,7 @@ def main():
             )
             results = all_results[selected_file]
         else:
+            selected_file = 0
             results = all_results[0]
             st.subheader(f"📄 {results['filename']}")
         
@@ -375,7 +537,7 @@ def main():
             st.dataframe(activity_df, use_container_width=True)
             
             # Download button for activity data
-            csv = activity_df.to_csv(index=False)
+            csv = to_csv_bytes(activity_df)
             st.download_button(
                 label="📥 Download Activity Data",
                 data=csv,
@@ -403,23 +565,27 @@ def main():
             st.metric("Total Assignments", results['total_assignments'])
             st.metric("Total Resources", results['total_resources'])
             
-            # Redundant logic
-            redundant_count = results['redundant_logic']['redundant_count']
-            st.metric("Redundant Relationships", redundant_count)
-            
-            if redundant_count > 0:
-                with st.expander("🔍 View Redundant Relationships"):
-                    redundant_df = pd.DataFrame(results['redundant_logic']['redundant_relationships'])
-                    st.dataframe(redundant_df, use_container_width=True)
-                    
-                    # Download redundant relationships
-                    csv = redundant_df.to_csv(index=False)
-                    st.download_button(
-                        label="📥 Download Redundant Logic",
-                        data=csv,
-                        file_name=f"redundant_logic_{results['filename']}.csv",
-                        mime="text/csv"
-                    )
+            # Redundant logic, only computed when enabled in the sidebar
+            if not check_redundant:
+                st.caption("Enable *Detect redundant logic* in the sidebar to check relationships")
+            else:
+                redundant_logic = _redundant_logic_cached(*all_files[selected_file])
+                redundant_count = redundant_logic['redundant_count']
+                st.metric("Redundant Relationships", redundant_count)
+                
+                if redundant_count > 0:
+                    with st.expander("🔍 View Redundant Relationships"):
+                        redundant_df = pd.DataFrame(redundant_logic['redundant_relationships'])
+                        st.dataframe(redundant_df, use_container_width=True)
+                        
+                        # Download redundant relationships
+                        csv = to_csv_bytes(redundant_df)
+                        st.download_button(
+                            label="📥 Download Redundant Logic",
+                            data=csv,
+                            file_name=f"redundant_logic_{results['filename']}.csv",
+                            mime="text/csv"
+                        )
     
     with tab2:
         st.header("💰 Cost Metrics")
@@ -478,7 +644,7 @@ def main():
             st.dataframe(cost_breakdown, use_container_width=True)
             
             # Download cost data
-            csv = cost_breakdown.to_csv(index=False)
+            csv = to_csv_bytes(cost_breakdown)
             st.download_button(
                 label="📥 Download Cost Analysis",
                 data=csv,
@@ -492,7 +658,7 @@ def main():
         
         # Create comparison dataframes
         comparison_data = []
-        for result in all_results:
+        for result, file in zip(all_results, all_files):
             row = {
                 'File': result['filename'],
                 'Total Activities': sum(result['activity_counts'].values()),
@@ -502,16 +668,17 @@ def main():
                 'Labor Cost': result['costs']['labor'],
                 'Non-Labor Cost': result['costs']['nonlabor'],
                 'Material Cost': result['costs']['material'],
-                'Total Cost': result['costs']['labor'] + result['costs']['nonlabor'] + result['costs']['material'],
-                'Redundant Relations': result['redundant_logic']['redundant_count']
+                'Total Cost': result['costs']['labor'] + result['costs']['nonlabor'] + result['costs']['material']
             }
+            if check_redundant:
+                row['Redundant Relations'] = _redundant_logic_cached(*file)['redundant_count']
             comparison_data.append(row)
         
         comparison_df = pd.DataFrame(comparison_data)
         st.dataframe(comparison_df, use_container_width=True)
         
         # Download comparison
-        csv = comparison_df.to_csv(index=False)
+        csv = to_csv_bytes(comparison_df)
         st.download_button(
             label="📥 Download Comparison",
             data=csv,